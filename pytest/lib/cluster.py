@@ -1,10 +1,20 @@
 import atexit
 import base64
+import collections
+import concurrent.futures
+import copy
+import functools
+import http.client
 import json
+import logging
+import mmap
 import os
 import pathlib
+import queue
+import random
 import rc
-from geventhttpclient import Session
+import re
+from geventhttpclient import Session, useragent
 import shutil
 import signal
 import subprocess
@@ -14,11 +24,17 @@ import time
 import traceback
 import typing
 import uuid
+import weakref
 from rc import gcloud
 from retrying import retry
 
 import base58
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 import network
 from configured_logger import logger
 from key import Key
@@ -26,9 +42,46 @@ from proxy import NodesProxy
 
 os.environ["ADVERSARY_CONSENT"] = "1"
 
+# Environment of neard processes started by `LocalNode.run_cmd`, sans the
+# per-invocation extra variables.  Computed once since it's the same for all
+# nodes.
+_NEARD_BASE_ENV = os.environ.copy()
+_NEARD_BASE_ENV["RUST_BACKTRACE"] = "1"
+_NEARD_BASE_ENV["RUST_LOG"] = ("actix_web=warn,mio=warn,tokio_util=warn,"
+                               "actix_server=warn,actix_http=warn," +
+                               _NEARD_BASE_ENV.get("RUST_LOG", "debug"))
+
 remote_nodes = []
 remote_nodes_lock = threading.Lock()
-cleanup_remote_nodes_atexit_registered = False
+cleanup_remote_nodes_atexit_registered = threading.Event()
+
+# Nodes are constructed concurrently by `start_cluster` and atexit doesn't
+# document registration as thread-safe so serialise it.
+atexit_lock = threading.Lock()
+
+# Maximum number of responses kept in a node's read-only RPC cache.  See
+# `BaseNode._cached_json_rpc`.
+RPC_CACHE_MAX_ENTRIES = 4096
+
+# Minimum time, in seconds, between storage consistency checks done implicitly
+# by `BaseNode.get_status`.  See `BaseNode._maybe_check_store`.
+CHECK_STORE_INTERVAL = 1.0
+
+# Upper bound, in seconds, of the delay between attempts in `nretry`.
+NRETRY_MAX_DELAY = 1.0
+
+# Errors indicating that a node's RPC endpoint is unreachable, not ready yet or
+# returned a garbled response.  `nretry` retries on those and nothing else.
+# geventhttpclient raises `http.client.HTTPException` subclasses when a peer
+# accepts a connection and closes it without responding, e.g. a node which is
+# restarting.
+RPC_ERRORS = (useragent.ConnectionError, OSError, http.client.HTTPException,
+              json.JSONDecodeError)
+
+# JSON-RPC methods which don't modify node state.  Concurrent identical
+# requests for those are coalesced into a single HTTP round-trip, see
+# `BaseNode._single_flight`.
+READ_ONLY_RPC_METHODS = frozenset(('block', 'chunk', 'query', 'validators'))
 
 
 # Return the session object that can be used for making http requests.
@@ -47,6 +100,158 @@ def session(timeout=9, max_retries=5) -> Session:
                    retry_delay=0.1)
 
 
+class _ThreadSessions:
+    """Sessions handed out by `BaseNode._session` to a single thread.
+
+    Instances live in a `threading.local` so they go away together with their
+    thread (or node) at which point the sessions are closed.  Anything still
+    alive when the interpreter exits is closed then.
+    """
+
+    def __init__(self) -> None:
+        self.by_params = {}
+        weakref.finalize(self, _close_sessions, self.by_params)
+
+
+def _close_sessions(sessions) -> None:
+    for s in sessions.values():
+        s.close()
+    sessions.clear()
+
+
+# Directories queued for removal by `_delete_in_background`.
+_pending_deletes = queue.Queue()
+
+
+def _delete_pending():
+    while True:
+        path = _pending_deletes.get()
+        try:
+            if os.name == 'posix':
+                # coreutils' rm walks the tree with unlinkat and friends which
+                # is noticeably faster than shutil.rmtree on large RocksDB
+                # directories.
+                subprocess.run(('rm', '-rf', '--', path), check=False)
+            else:
+                shutil.rmtree(path, ignore_errors=True)
+        finally:
+            _pending_deletes.task_done()
+
+
+def _delete_in_background(path, trash_dir):
+    """Moves directory at `path` out of the way and removes it asynchronously.
+
+    The directory is renamed into `trash_dir` (which must be on the same file
+    system) so `path` is free to be reused as soon as this function returns.
+    The actual removal happens on a background thread and is waited for before
+    the interpreter exits.
+    """
+    trash_path = os.path.join(
+        trash_dir, f'.deleting-{uuid.uuid4().hex}-{os.path.basename(path)}')
+    os.rename(path, trash_path)
+    _pending_deletes.put(trash_path)
+
+
+# The worker is started at import time since the first deletion often happens
+# in an atexit handler and new threads can't be started during interpreter
+# shutdown.
+threading.Thread(target=_delete_pending, daemon=True).start()
+# Registered at import time so that it runs after all node cleanups (atexit
+# calls handlers in reverse order of registration).
+atexit.register(_pending_deletes.join)
+
+# Whether config and genesis files written by this module should be indented.
+# They're only ever read by neard and tests so by default they're written in
+# compact form which for large genesis files is about half the size.  Set
+# NEAR_PYTEST_PRETTY_JSON=1 when the files need to be inspected by hand.
+_PRETTY_JSON = os.environ.get('NEAR_PYTEST_PRETTY_JSON') == '1'
+
+# Matches a number literal which may not fit in 64 bits.  orjson silently
+# parses those as floats losing precision (e.g. genesis total_supply) so
+# documents containing one are parsed with the standard library instead.  The
+# pattern may also match inside strings which merely costs us the fast path.
+_WIDE_INT_RE = re.compile(rb'[\[:,]\s*-?\d{19}')
+
+
+def _json_loads(data: bytes):
+    """Parses a JSON document, using orjson if it is available."""
+    if orjson is not None and _WIDE_INT_RE.search(data) is None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj, *, indent: bool = False) -> bytes:
+    """Serialises object to JSON, using orjson if it is available.
+
+    The output is compact unless `indent` is true in which case it's indented
+    with two spaces.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj,
+                                option=orjson.OPT_INDENT_2 if indent else None)
+        except TypeError:
+            # orjson refuses e.g. integers wider than 64 bits; let the standard
+            # library deal with those.
+            pass
+    if indent:
+        return json.dumps(obj, indent=2).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def _json_copy(obj):
+    """Returns a deep copy of a JSON-like object (dicts, lists and scalars).
+
+    With orjson, round-tripping through serialisation is several times faster
+    than `copy.deepcopy` which has to dispatch on every object it visits.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(orjson.dumps(obj))
+        except TypeError:
+            # e.g. integers wider than 64 bits.
+            pass
+    return copy.deepcopy(obj)
+
+
+def _read_json(path):
+    """Reads and parses JSON file at given path."""
+    with open(path, 'rb') as fd:
+        return _json_loads(fd.read())
+
+
+def _read_json_mmap(path):
+    """Reads and parses JSON file at given path by memory-mapping it.
+
+    With orjson the document is parsed straight from the mapped pages without
+    first copying the file into a Python buffer which matters for huge genesis
+    files.  The standard library can't parse from a buffer so without orjson
+    this is equivalent to `_read_json`.
+    """
+    if orjson is None:
+        return _read_json(path)
+    with open(path, 'rb') as fd:
+        if os.fstat(fd.fileno()).st_size == 0:
+            # Empty files cannot be mapped; let the parser report the error.
+            return orjson.loads(fd.read())
+        with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if _WIDE_INT_RE.search(mm) is not None:
+                return json.loads(mm[:])
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
+
+def _write_json(path, obj) -> None:
+    """Writes object as JSON to file at given path.
+
+    The output is compact unless pretty-printing has been requested through
+    the NEAR_PYTEST_PRETTY_JSON environment variable.
+    """
+    data = _json_dumps(obj, indent=_PRETTY_JSON)
+    with open(path, 'wb') as fd:
+        fd.write(data)
+
+
 class DownloadException(Exception):
     pass
 
@@ -56,30 +261,46 @@ def atexit_cleanup(node):
     logger.info("Executed store validity tests: %s" % node.store_tests)
     try:
         node.cleanup()
-    except:
+    except Exception:
         logger.info("Cleaning failed!")
-        traceback.print_exc()
-        pass
+        if logger.isEnabledFor(logging.DEBUG):
+            traceback.print_exc()
 
 
 def atexit_cleanup_remote():
+    # Take the nodes out under the lock but don't hold it while cleaning up.
     with remote_nodes_lock:
-        if remote_nodes:
-            rc.pmap(atexit_cleanup, remote_nodes)
+        nodes = list(remote_nodes)
+        remote_nodes.clear()
+    # concurrent.futures refuses to schedule work once the interpreter is
+    # shutting down so use plain threads here.
+    threads = [
+        threading.Thread(target=atexit_cleanup, args=(node,)) for node in nodes
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
 
 
 # custom retry that is used in wait_for_rpc() and get_status()
+#
+# The delay between attempts grows exponentially up to NRETRY_MAX_DELAY and the
+# actual sleep is picked uniformly at random from [0, delay) so that many
+# callers polling the same node don't retry in lockstep.  The sleep never
+# extends past the deadline.
 def nretry(fn, timeout):
     started = time.time()
     delay = 0.05
     while True:
         try:
             return fn()
-        except:
-            if time.time() - started >= timeout:
+        except RPC_ERRORS:
+            remaining = started + timeout - time.time()
+            if remaining <= 0:
                 raise
-            time.sleep(delay)
-            delay *= 1.2
+            time.sleep(min(random.uniform(0, delay), remaining))
+            delay = min(NRETRY_MAX_DELAY, delay * 2)
 
 
 BootNode = typing.Union[None, 'BaseNode', typing.Iterable['BaseNode']]
@@ -118,6 +339,11 @@ def make_boot_nodes_arg(boot_node: BootNode) -> typing.Tuple[str]:
     return ('--boot-nodes', nodes)
 
 
+@functools.lru_cache(maxsize=1024)
+def _decode_block_hash(block_hash: str) -> bytes:
+    return base58.b58decode(block_hash.encode('ascii'))
+
+
 class BlockId(typing.NamedTuple):
     """Stores block’s height and hash.
 
@@ -139,11 +365,12 @@ class BlockId(typing.NamedTuple):
 
     @classmethod
     def from_header(cls, header: typing.Dict[str, typing.Any]) -> 'BlockId':
-        return cls(height=int(header['height']), hash=header['hash'])
+        return cls(height=int(header['height']),
+                   hash=sys.intern(header['hash']))
 
     @property
     def hash_bytes(self) -> bytes:
-        return base58.b58decode(self.hash.encode('ascii'))
+        return _decode_block_hash(self.hash)
 
     def __str__(self) -> str:
         return f'#{self.height} {self.hash}'
@@ -153,6 +380,21 @@ class BlockId(typing.NamedTuple):
                 self.hash == rhs.hash)
 
 
+def _rpc_key(method, params) -> typing.Tuple[str, str]:
+    """Returns a key identifying a JSON-RPC request to `method`."""
+    return (method, json.dumps(params, sort_keys=True, separators=(',', ':')))
+
+
+class _InflightCall:
+    """State of a request shared by `BaseNode._single_flight` callers."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
 class BaseNode(object):
 
     def __init__(self):
@@ -161,6 +403,13 @@ class BaseNode(object):
         self.proxy = None
         self.store_tests = 0
         self.is_check_store = True
+        self._last_check_store = 0.0
+        self._rpc_cache = collections.OrderedDict()
+        self._rpc_cache_lock = threading.Lock()
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._sessions = threading.local()
+        self._rpc_base_url = None
 
     def change_config(self, overrides: typing.Dict[str, typing.Any]) -> None:
         """Change client config.json of a node by applying given overrides.
@@ -222,6 +471,33 @@ class BaseNode(object):
         host, port = self.addr()
         return '{}@{}:{}'.format(pk_hash, host, port)
 
+    def _session(self, timeout=9, max_retries=5) -> Session:
+        """Returns a session for making http requests to the node.
+
+        Unlike `session`, the returned session is cached per thread and per
+        `(timeout, max_retries)` pair so that keep-alive connections to the
+        node are reused across requests.  It must not be closed by the caller
+        and in particular must not be used in a `with` statement.
+        """
+        holder = getattr(self._sessions, 'holder', None)
+        if holder is None:
+            holder = self._sessions.holder = _ThreadSessions()
+        sessions = holder.by_params
+        s = sessions.get((timeout, max_retries))
+        if s is None:
+            s = sessions[(timeout, max_retries)] = session(timeout, max_retries)
+        return s
+
+    def _rpc_url(self, path: str = '') -> str:
+        """Returns URL of given path on the node's RPC server.
+
+        The RPC address doesn't change once a node is set up so the base URL is
+        formatted on first use only.
+        """
+        if self._rpc_base_url is None:
+            self._rpc_base_url = "http://%s:%s" % self.rpc_addr()
+        return self._rpc_base_url + path
+
     def wait_for_rpc(self, timeout=1):
         nretry(lambda: self.get_status(), timeout=timeout)
 
@@ -229,6 +505,11 @@ class BaseNode(object):
     #
     # Please note that if the request is consistently failing the default parameters
     # mean that the call will take connection_timeout + timeout * (1 + max_retries) ~ 1 minute.
+    #
+    # neard's JSON-RPC server doesn't support JSON-RPC 2.0 batches (it responds
+    # with a parse error to an array of requests) so there's no batch variant
+    # of this method.  Back-to-back calls reuse the same keep-alive connection
+    # though, see `_session`.
     def json_rpc(self, method, params, timeout=9, max_retries=5):
         j = {
             'method': method,
@@ -236,66 +517,148 @@ class BaseNode(object):
             'id': 'dontcare',
             'jsonrpc': '2.0'
         }
-        with session(timeout, max_retries) as s:
-            r = s.post("http://%s:%s" % self.rpc_addr(), json=j)
+
+        def send():
+            s = self._session(timeout, max_retries)
+            r = s.post(self._rpc_url(),
+                       data=_json_dumps(j),
+                       headers={'Content-Type': 'application/json'})
             r.raise_for_status()
-        return json.loads(r.content)
+            return _json_loads(r.content)
+
+        if method not in READ_ONLY_RPC_METHODS:
+            return send()
+        # Callers only share a request made with their own timeouts.
+        return self._single_flight(
+            (_rpc_key(method, params), timeout, max_retries), send)
+
+    def _single_flight(self, key, fn):
+        """Calls `fn` making sure concurrent calls with the same key share it.
+
+        The first caller for a given key executes `fn` while all callers which
+        arrive before it finishes wait for and get a copy of its result (or
+        have its exception re-raised).  Once `fn` returns, subsequent calls
+        with the same key execute it again.
+        """
+        with self._inflight_lock:
+            call = self._inflight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._inflight[key] = _InflightCall()
+            else:
+                call.waiters += 1
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return _json_copy(call.result)
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+            call.done.set()
+        # Waiters copy the result so the caller must not mutate it in place.
+        return _json_copy(call.result) if call.waiters else call.result
+
+    def _cached_json_rpc(self, method, params, **kwargs):
+        """Sends a read-only JSON-RPC request, reusing earlier responses.
+
+        Successful responses are kept in a per-node LRU cache keyed on the
+        method and canonically serialised params.  Callers always get their
+        own copy of the response so they are free to mutate it.  Error
+        responses are never cached.
+
+        Entries never expire so only use this for lookups whose answer can't
+        change, i.e. a block by its hash.  Anything keyed on finality, height
+        or the current epoch must go through `json_rpc` directly.
+        """
+        key = _rpc_key(method, params)
+        with self._rpc_cache_lock:
+            res = self._rpc_cache.get(key)
+            if res is not None:
+                self._rpc_cache.move_to_end(key)
+                return _json_copy(res)
+        res = self.json_rpc(method, params, **kwargs)
+        if 'error' not in res:
+            with self._rpc_cache_lock:
+                self._rpc_cache[key] = res
+                self._rpc_cache.move_to_end(key)
+                while len(self._rpc_cache) > RPC_CACHE_MAX_ENTRIES:
+                    self._rpc_cache.popitem(last=False)
+        return _json_copy(res)
 
     def send_tx(self, signed_tx):
         return self.json_rpc('broadcast_tx_async',
-                             [base64.b64encode(signed_tx).decode('utf8')])
+                             [base64.b64encode(signed_tx).decode('ascii')])
 
     def send_tx_and_wait(self, signed_tx, timeout):
         return self.json_rpc('broadcast_tx_commit',
-                             [base64.b64encode(signed_tx).decode('utf8')],
+                             [base64.b64encode(signed_tx).decode('ascii')],
                              timeout=timeout)
 
     def get_status(self,
                    check_storage: bool = True,
                    timeout: float = 4,
                    verbose: bool = False):
-        with session(timeout) as s:
-            r = s.get("http://%s:%s/status" % self.rpc_addr())
+
+        def fetch():
+            r = self._session(timeout).get(self._rpc_url('/status'))
             r.raise_for_status()
-            status = json.loads(r.content)
+            return _json_loads(r.content)
+
+        status = self._single_flight(('/status', timeout), fetch)
         if verbose:
             logger.info(f'Status: {status}')
         if check_storage and status['sync_info']['syncing'] == False:
             # Storage is not guaranteed to be in consistent state while syncing
-            self.check_store()
+            self._maybe_check_store()
         if verbose:
             logger.info(status)
         return status
 
     def get_metrics(self, timeout: float = 4):
-        with session(timeout) as s:
-            r = s.get("http://%s:%s/metrics" % self.rpc_addr())
-            r.raise_for_status()
+        r = self._session(timeout).get(self._rpc_url('/metrics'))
+        r.raise_for_status()
         return r.content
 
     def get_latest_block(self, **kw) -> BlockId:
         sync_info = self.get_status(**kw)['sync_info']
         return BlockId(height=sync_info['latest_block_height'],
-                       hash=sync_info['latest_block_hash'])
+                       hash=sys.intern(sync_info['latest_block_hash']))
+
+    def _get_block_header(self, block_hash):
+        """Returns header of the block with given hash or None if it's missing.
+
+        Unlike `get_block` this bypasses the response cache and keeps only the
+        header so the rest of the block can be freed right away.  This matters
+        when walking long chains.
+        """
+        block = self.json_rpc('block', [block_hash])
+        error = block.get('error')
+        if error and 'data' in error and 'DB Not Found Error: BLOCK:' in error[
+                'data']:
+            return None
+        elif 'result' not in block:
+            logger.info(block)
+        return block['result']['header']
 
     def get_all_heights(self):
         hash_ = self.get_latest_block().hash
         heights = []
 
         while True:
-            block = self.get_block(hash_)
-            if 'error' in block and 'data' in block[
-                    'error'] and 'DB Not Found Error: BLOCK:' in block['error'][
-                        'data']:
+            header = self._get_block_header(hash_)
+            if header is None:
                 break
-            elif 'result' not in block:
-                logger.info(block)
-
-            height = block['result']['header']['height']
+            height = header['height']
             if height == 0:
                 break
             heights.append(height)
-            hash_ = block['result']['header']['prev_hash']
+            hash_ = header['prev_hash']
 
         return reversed(heights)
 
@@ -360,7 +723,21 @@ class BaseNode(object):
                 break
             time.sleep(0.2)
 
+    def get_access_key(self, acc, pk, finality='optimistic'):
+        return self.json_rpc(
+            'query', {
+                "request_type": "view_access_key",
+                "account_id": acc,
+                "public_key": pk,
+                "finality": finality
+            })
+
     def get_nonce_for_pk(self, acc, pk, finality='optimistic'):
+        res = self.get_access_key(acc, pk, finality)
+        if 'result' in res:
+            # For a missing key the node responds with a result containing
+            # an error message rather than with an error.
+            return res['result'].get('nonce')
         for access_key in self.get_access_key_list(acc,
                                                    finality)['result']['keys']:
             if access_key['public_key'] == pk:
@@ -368,6 +745,9 @@ class BaseNode(object):
         return None
 
     def get_block(self, block_id, **kwargs):
+        # Only a block hash pins the block down; a height can be reorged.
+        if isinstance(block_id, str):
+            return self._cached_json_rpc('block', [block_id], **kwargs)
         return self.json_rpc('block', [block_id], **kwargs)
 
     def get_block_by_height(self, block_height, **kwargs):
@@ -410,7 +790,14 @@ class BaseNode(object):
                        self.addr())
         self.is_check_store = False
 
+    def _maybe_check_store(self):
+        # get_status calls this on every invocation; there's little value in
+        # re-checking storage more often than once per CHECK_STORE_INTERVAL.
+        if time.monotonic() - self._last_check_store >= CHECK_STORE_INTERVAL:
+            self.check_store()
+
     def check_store(self):
+        self._last_check_store = time.monotonic()
         if self.is_check_store:
             res = self.json_rpc('adv_check_store', [])
             if not 'result' in res:
@@ -462,8 +849,7 @@ class LocalNode(BaseNode):
             os.path.join(node_dir, "validator_key.json"))
         self.node_key = Key.from_json_file(
             os.path.join(node_dir, "node_key.json"))
-        self.signer_key = Key.from_json_file(
-            os.path.join(node_dir, "validator_key.json"))
+        self.signer_key = self.validator_key
         self._process = None
 
         self.change_config({
@@ -479,7 +865,8 @@ class LocalNode(BaseNode):
             },
         })
 
-        atexit.register(atexit_cleanup, self)
+        with atexit_lock:
+            atexit.register(atexit_cleanup, self)
 
     def change_config(self, overrides: typing.Dict[str, typing.Any]) -> None:
         apply_config_changes(self.node_dir, overrides)
@@ -538,12 +925,7 @@ class LocalNode(BaseNode):
                 '=== failed to start node, rpc is not ready in 10 seconds')
 
     def run_cmd(self, *, cmd: tuple, extra_env: typing.Dict[str, str] = dict()):
-
-        env = os.environ.copy()
-        env["RUST_BACKTRACE"] = "1"
-        env["RUST_LOG"] = "actix_web=warn,mio=warn,tokio_util=warn,actix_server=warn,actix_http=warn," + env.get(
-            "RUST_LOG", "debug")
-        env.update(extra_env)
+        env = {**_NEARD_BASE_ENV, **extra_env}
         node_dir = pathlib.Path(self.node_dir)
         self.stdout_name = node_dir / 'stdout'
         self.stderr_name = node_dir / 'stderr'
@@ -553,7 +935,9 @@ class LocalNode(BaseNode):
                                              stdin=subprocess.DEVNULL,
                                              stdout=stdout,
                                              stderr=stderr,
-                                             env=env)
+                                             env=env,
+                                             close_fds=False,
+                                             start_new_session=True)
         self._pid = self._process.pid
 
     def kill(self, *, gentle=False):
@@ -562,24 +946,39 @@ class LocalNode(BaseNode):
         if self._proxy_local_stopped is not None:
             self._proxy_local_stopped.value = 1
         if self._process and gentle:
-            self._process.send_signal(signal.SIGINT)
+            self._signal_process_group(signal.SIGINT)
             try:
                 self._process.wait(5)
                 self._process = None
             except subprocess.TimeoutExpired:
                 pass
         if self._process:
-            self._process.kill()
+            self._signal_process_group(signal.SIGKILL)
             self._process.wait(5)
             self._process = None
 
+    def _signal_process_group(self, sig):
+        """Sends signal to the node's process group.
+
+        `run_cmd` starts neard in a new session so the process group includes
+        any helper processes it spawned.  If the group is gone (e.g. the process
+        has already been reaped) falls back to signalling the process only.
+        """
+        try:
+            # With start_new_session the process is its group's leader so its
+            # pid is also the group id.
+            os.killpg(self._process.pid, sig)
+        except ProcessLookupError:
+            self._process.send_signal(sig)
+
     def reload_updateable_config(self):
         logger.info(f"Reloading updateable config for node {self.ordinal}.")
         """Sends SIGHUP signal to the process in order to trigger updateable config reload."""
         self._process.send_signal(signal.SIGHUP)
 
     def reset_data(self):
-        shutil.rmtree(os.path.join(self.node_dir, "data"))
+        _delete_in_background(os.path.join(self.node_dir, "data"),
+                              os.path.dirname(os.path.abspath(self.node_dir)))
 
     def reset_validator_key(self, new_key):
         self.validator_key = new_key
@@ -603,7 +1002,8 @@ class LocalNode(BaseNode):
         # move the node dir to avoid weird interactions with multiple serial test invocations
         target_path = self.node_dir + '_finished'
         if os.path.exists(target_path) and os.path.isdir(target_path):
-            shutil.rmtree(target_path)
+            _delete_in_background(target_path,
+                                  os.path.dirname(os.path.abspath(target_path)))
         os.rename(self.node_dir, target_path)
         self.node_dir = target_path
         self.output_logs()
@@ -621,6 +1021,7 @@ class LocalNode(BaseNode):
 class GCloudNode(BaseNode):
 
     def __init__(self, *args, username=None, project=None, ssh_key_path=None):
+        super(GCloudNode, self).__init__()
         if len(args) == 1:
             name = args[0]
             # Get existing instance assume it's ready to run.
@@ -654,10 +1055,9 @@ class GCloudNode(BaseNode):
             self._upload_config_files(node_dir)
             self._download_binary(binary)
             with remote_nodes_lock:
-                global cleanup_remote_nodes_atexit_registered
-                if not cleanup_remote_nodes_atexit_registered:
+                if not cleanup_remote_nodes_atexit_registered.is_set():
                     atexit.register(atexit_cleanup_remote)
-                    cleanup_remote_nodes_atexit_registered = True
+                    cleanup_remote_nodes_atexit_registered.set()
         else:
             raise Exception()
 
@@ -669,8 +1069,7 @@ class GCloudNode(BaseNode):
             os.path.join(node_dir, "validator_key.json"))
         self.node_key = Key.from_json_file(
             os.path.join(node_dir, "node_key.json"))
-        self.signer_key = Key.from_json_file(
-            os.path.join(node_dir, "validator_key.json"))
+        self.signer_key = self.validator_key
 
     @retry(wait_fixed=1000, stop_max_attempt_number=3)
     def _download_binary(self, binary):
@@ -714,7 +1113,8 @@ chmod +x neard
         # move the node dir to avoid weird interactions with multiple serial test invocations
         target_path = self.node_dir + '_finished'
         if os.path.exists(target_path) and os.path.isdir(target_path):
-            shutil.rmtree(target_path)
+            _delete_in_background(target_path,
+                                  os.path.dirname(os.path.abspath(target_path)))
         os.rename(self.node_dir, target_path)
 
         # Get log and delete machine
@@ -728,13 +1128,12 @@ chmod +x neard
         return super().json_rpc(method, params, timeout=timeout)
 
     def get_status_impl(self):
-        with session(timeout=15) as s:
-            return s.get("http://%s:%s/status" % self.rpc_addr())
+        return self._session(timeout=15).get(self._rpc_url('/status'))
 
     def get_status(self):
         r = nretry(lambda: self.get_status_impl, timeout=45)
         r.raise_for_status()
-        return json.loads(r.content)
+        return _json_loads(r.content)
 
     def stop_network(self):
         rc.run(
@@ -759,7 +1158,7 @@ def spin_up_node(config,
                  ordinal,
                  *,
                  boot_node: BootNode = None,
-                 blacklist=[],
+                 blacklist=(),
                  proxy=None,
                  skip_starting_proxy=False,
                  single_node=False) -> BaseNode:
@@ -797,7 +1196,13 @@ def spin_up_node(config,
         proxy.proxify_node(node)
 
     node.start(boot_node=boot_node, skip_starting_proxy=skip_starting_proxy)
-    time.sleep(3)
+    # Rather than sleeping for a fixed amount of time, proceed as soon as the
+    # node answers RPC requests.  Usually that's already the case once start
+    # returns.
+    try:
+        node.wait_for_rpc(timeout=9)
+    except RPC_ERRORS:
+        logger.warning(f"node {ordinal} RPC is not ready after 9 seconds")
     logger.info(f"node {ordinal} started")
     return node
 
@@ -829,32 +1234,32 @@ def init_cluster(num_nodes,
                 ("LOCAL" if is_local else "REMOTE", num_nodes + num_observers))
 
     binary_path = os.path.join(near_root, binary_name)
-    process = subprocess.Popen(
-        [
-            binary_path,
-            "localnet",
-            "--validators",
-            str(num_nodes),
-            "--non-validators",
-            str(num_observers),
-            "--shards",
-            str(num_shards),
-            "--tracked-shards",
-            "none",
-            "--prefix",
-            prefix,
-        ],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-    )
-    out, err = process.communicate()
-    assert 0 == process.returncode, err
-
-    node_dirs = [
-        line.split()[-1]
-        for line in err.decode('utf8').split('\n')
-        if '/test' in line
+    cmd = [
+        binary_path,
+        "localnet",
+        "--validators",
+        str(num_nodes),
+        "--non-validators",
+        str(num_observers),
+        "--shards",
+        str(num_shards),
+        "--tracked-shards",
+        "none",
+        "--prefix",
+        prefix,
     ]
+    # Pick node directories out of stderr as it's being produced.  Exiting the
+    # with block closes the pipe and waits for the process.
+    err = []
+    node_dirs = []
+    with subprocess.Popen(cmd,
+                          stdout=subprocess.DEVNULL,
+                          stderr=subprocess.PIPE) as process:
+        for line in process.stderr:
+            err.append(line)
+            if b'/test' in line:
+                node_dirs.append(line.split()[-1].decode('utf8'))
+    assert 0 == process.returncode, b''.join(err)
     assert len(
         node_dirs
     ) == num_nodes + num_observers, "node dirs: %s num_nodes: %s num_observers: %s" % (
@@ -862,57 +1267,92 @@ def init_cluster(num_nodes,
 
     logger.info("Search for stdout and stderr in %s" % node_dirs)
     # apply config changes
-    for i, node_dir in enumerate(node_dirs):
-        apply_genesis_changes(node_dir, genesis_config_changes)
+    genesis = _modified_genesis_bytes(node_dirs[0], genesis_config_changes)
+
+    def configure_node(i, node_dir):
+        with open(os.path.join(node_dir, 'genesis.json'), 'wb') as fd:
+            fd.write(genesis)
         overrides = client_config_changes.get(i)
         if overrides:
             apply_config_changes(node_dir, overrides)
 
+    # Nodes' files are independent so rewrite them concurrently.
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(32, len(node_dirs))) as executor:
+        list(executor.map(configure_node, range(len(node_dirs)), node_dirs))
+
     return near_root, node_dirs
 
 
+def _modify_genesis(genesis_config, genesis_config_changes):
+    # Changes often share a path prefix (e.g. several fields of the same
+    # validator or account record) so remember containers resolved so far.
+    resolved = {}
+    for change in genesis_config_changes:
+        prefix = tuple(change[:-2])
+        cur = resolved.get(prefix)
+        if cur is None:
+            cur = genesis_config
+            for s in prefix:
+                cur = cur[s]
+            resolved[prefix] = cur
+        key = change[-2]
+        assert key in cur
+        if isinstance(cur[key], (dict, list)):
+            # The container is being replaced so forget anything resolved
+            # through it.
+            path = prefix + (key,)
+            for stale in [p for p in resolved if p[:len(path)] == path]:
+                del resolved[stale]
+        cur[key] = change[-1]
+
+
 def apply_genesis_changes(node_dir, genesis_config_changes):
     # apply genesis.json changes
     fname = os.path.join(node_dir, 'genesis.json')
-    with open(fname) as fd:
-        genesis_config = json.load(fd)
-    for change in genesis_config_changes:
-        cur = genesis_config
-        for s in change[:-2]:
-            cur = cur[s]
-        assert change[-2] in cur
-        cur[change[-2]] = change[-1]
-    with open(fname, 'w') as fd:
-        json.dump(genesis_config, fd, indent=2)
+    genesis_config = _read_json_mmap(fname)
+    _modify_genesis(genesis_config, genesis_config_changes)
+    _write_json(fname, genesis_config)
+
+
+def _modified_genesis_bytes(node_dir, genesis_config_changes) -> bytes:
+    """Returns node's genesis.json with changes applied, serialised.
+
+    Lets `init_cluster` parse and serialise genesis only once and write the
+    result to all nodes, since `neard localnet` creates identical genesis.json
+    files for each of them.
+    """
+    genesis_config = _read_json_mmap(os.path.join(node_dir, 'genesis.json'))
+    _modify_genesis(genesis_config, genesis_config_changes)
+    return _json_dumps(genesis_config, indent=_PRETTY_JSON)
+
+
+# ClientConfig keys which are valid but may be missing from the config.json
+# file.  Those are often Option<T> types which are not stored in JSON file
+# when None.
+ALLOWED_MISSING_CONFIGS = frozenset(
+    ('archive', 'consensus.block_fetch_horizon',
+     'consensus.min_block_production_delay',
+     'consensus.max_block_production_delay', 'consensus.max_block_wait_delay',
+     'consensus.state_sync_timeout', 'expected_shutdown', 'log_summary_period',
+     'max_gas_burnt_view', 'rosetta_rpc', 'save_trie_changes', 'split_storage',
+     'state_sync', 'state_sync_enabled', 'store.state_snapshot_enabled',
+     'tracked_shard_schedule', 'cold_store',
+     'store.load_mem_tries_for_tracked_shards'))
 
 
 def apply_config_changes(node_dir, client_config_change):
     # apply config.json changes
     fname = os.path.join(node_dir, 'config.json')
-    with open(fname) as fd:
-        config_json = json.load(fd)
-
-    # ClientConfig keys which are valid but may be missing from the config.json
-    # file.  Those are often Option<T> types which are not stored in JSON file
-    # when None.
-    allowed_missing_configs = ('archive', 'consensus.block_fetch_horizon',
-                               'consensus.min_block_production_delay',
-                               'consensus.max_block_production_delay',
-                               'consensus.max_block_wait_delay',
-                               'consensus.state_sync_timeout',
-                               'expected_shutdown', 'log_summary_period',
-                               'max_gas_burnt_view', 'rosetta_rpc',
-                               'save_trie_changes', 'split_storage',
-                               'state_sync', 'state_sync_enabled',
-                               'store.state_snapshot_enabled',
-                               'tracked_shard_schedule', 'cold_store',
-                               'store.load_mem_tries_for_tracked_shards')
+    config_json = _read_json_mmap(fname)
 
     for k, v in client_config_change.items():
-        if not (k in allowed_missing_configs or k in config_json):
+        if not (k in ALLOWED_MISSING_CONFIGS or k in config_json):
             raise ValueError(f'Unknown configuration option: {k}')
         if k in config_json and isinstance(v, dict):
             config_json[k].update(v)
+        elif '.' not in k:
+            config_json[k] = v
         else:
             # Support keys in the form of "a.b.c".
             parts = k.split('.')
@@ -925,20 +1365,15 @@ def apply_config_changes(node_dir, client_config_change):
                 current = current[part]
             current[parts[-1]] = v
 
-    with open(fname, 'w') as fd:
-        json.dump(config_json, fd, indent=2)
+    _write_json(fname, config_json)
 
 
 def get_config_json(node_dir):
-    fname = os.path.join(node_dir, 'config.json')
-    with open(fname) as fd:
-        return json.load(fd)
+    return _read_json(os.path.join(node_dir, 'config.json'))
 
 
 def set_config_json(node_dir, config_json):
-    fname = os.path.join(node_dir, 'config.json')
-    with open(fname, 'w') as fd:
-        json.dump(config_json, fd, indent=2)
+    _write_json(os.path.join(node_dir, 'config.json'), config_json)
 
 
 def start_cluster(num_nodes,
@@ -955,9 +1390,10 @@ def start_cluster(num_nodes,
     if (dot_near / 'test0').exists():
         near_root = config['near_root']
         node_dirs = [
-            str(dot_near / name)
-            for name in os.listdir(dot_near)
-            if name.startswith('test') and not name.endswith('_finished')
+            entry.path
+            for entry in os.scandir(dot_near)
+            if entry.name.startswith('test') and
+            not entry.name.endswith('_finished')
         ]
     else:
         near_root, node_dirs = init_cluster(num_nodes, num_observers,
@@ -966,11 +1402,10 @@ def start_cluster(num_nodes,
                                             client_config_changes)
 
     proxy = NodesProxy(message_handler) if message_handler is not None else None
-    ret = []
+    single_node = (num_nodes == 1) and (num_observers == 0)
 
-    def spin_up_node_and_push(i, boot_node: BootNode):
-        single_node = (num_nodes == 1) and (num_observers == 0)
-        node = spin_up_node(config,
+    def spin_up(i, boot_node: BootNode):
+        return spin_up_node(config,
                             near_root,
                             node_dirs[i],
                             i,
@@ -978,22 +1413,19 @@ def start_cluster(num_nodes,
                             proxy=proxy,
                             skip_starting_proxy=True,
                             single_node=single_node)
-        ret.append((i, node))
-        return node
-
-    boot_node = spin_up_node_and_push(0, None)
 
-    handles = []
-    for i in range(1, num_nodes + num_observers):
-        handle = threading.Thread(target=spin_up_node_and_push,
-                                  args=(i, boot_node))
-        handle.start()
-        handles.append(handle)
+    # The boot node needs to be up first; the rest are independent of each
+    # other and spend most of the time waiting for RPC to become ready.
+    boot_node = spin_up(0, None)
+    nodes = [boot_node]
+    num_rest = num_nodes + num_observers - 1
+    if num_rest > 0:
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=num_rest) as executor:
+            nodes.extend(
+                executor.map(lambda i: spin_up(i, boot_node),
+                             range(1, num_rest + 1)))
 
-    for handle in handles:
-        handle.join()
-
-    nodes = [node for _, node in sorted(ret)]
     for node in nodes:
         node.start_proxy_if_needed()
 
@@ -1018,16 +1450,24 @@ DEFAULT_CONFIG = {
 CONFIG_ENV_VAR = 'NEAR_PYTEST_CONFIG'
 
 
+@functools.lru_cache(maxsize=16)
+def _read_config_file(config_file: str, mtime_ns: int):
+    # Cached by path and modification time so that repeated load_config calls
+    # don't re-read the file while rewriting it invalidates the entry.  Callers
+    # must not modify the returned dictionary.
+    return _read_json(config_file)
+
+
 def load_config():
     config = DEFAULT_CONFIG
 
     config_file = os.environ.get(CONFIG_ENV_VAR, '')
     if config_file:
         try:
-            with open(config_file) as f:
-                new_config = json.load(f)
-                config.update(new_config)
-                logger.info(f"Load config from {config_file}, config {config}")
+            new_config = _read_config_file(config_file,
+                                           os.stat(config_file).st_mtime_ns)
+            config.update(_json_copy(new_config))
+            logger.info(f"Load config from {config_file}, config {config}")
         except FileNotFoundError:
             logger.info(
                 f"Failed to load config file, use default config {config}")
@@ -1036,6 +1476,13 @@ def load_config():
     return config
 
 
+# Returns output of `neard --version`.  The binary's modification time is part
+# of the cache key so that rebuilding it invalidates the entry.
+@functools.lru_cache(maxsize=16)
+def _get_binary_version_output(binary_path, mtime_ns) -> str:
+    return subprocess.check_output([binary_path, "--version"], text=True)
+
+
 # Returns the protocol version of the binary.
 def get_binary_protocol_version(config) -> typing.Optional[int]:
     binary_name = config.get('binary_name', 'neard')
@@ -1045,7 +1492,8 @@ def get_binary_protocol_version(config) -> typing.Optional[int]:
     # Get the protocol version of the binary
     # The --version output looks like this:
     # neard (release trunk) (build 1.1.0-3884-ge93793a61-modified) (rustc 1.71.0) (protocol 137) (db 37)
-    out = subprocess.check_output([binary_path, "--version"], text=True)
+    out = _get_binary_version_output(binary_path,
+                                     os.stat(binary_path).st_mtime_ns)
     out = out.replace('(', '')
     out = out.replace(')', '')
     tokens = out.split()